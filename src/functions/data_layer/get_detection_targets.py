@@ -10,7 +10,7 @@ from __future__ import annotations
 import logging
 from typing import Any
 
-from shared import CosmosClient
+from shared import get_cosmos_client
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +36,7 @@ def get_detection_targets(
         f"Getting detection targets (include_disabled={include_disabled}, target_type={target_type})"
     )
 
-    client = CosmosClient()
+    client = get_cosmos_client()
 
     if target_type:
         # Filter by specific target type (always enabled only)
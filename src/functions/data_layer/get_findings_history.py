@@ -9,7 +9,7 @@ from __future__ import annotations
 import logging
 from typing import Any
 
-from shared import CosmosClient
+from shared import get_cosmos_client
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +37,7 @@ def get_findings_history(
         f"limit={limit}, status={status}"
     )
 
-    client = CosmosClient()
+    client = get_cosmos_client()
 
     if status:
         findings = client.get_findings_by_subscription_and_status(
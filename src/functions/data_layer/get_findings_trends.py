@@ -6,11 +6,11 @@ This endpoint is module-agnostic - it works for any detection module
 
 from __future__ import annotations
 
-from collections import defaultdict
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
-from shared import CosmosClient
+from shared import get_cosmos_client
 
 
 def get_findings_trends(
@@ -28,7 +28,7 @@ def get_findings_trends(
     Returns:
         Trend data with monthly aggregates and change summary
     """
-    client = CosmosClient()
+    client = get_cosmos_client()
 
     # Calculate date range
     today = datetime.now(timezone.utc)
@@ -48,24 +48,24 @@ def get_findings_trends(
     monthly_data = defaultdict(lambda: {
         "totalFindings": 0,
         "totalCost": 0.0,
-        "bySeverity": defaultdict(int),
-        "byResourceType": defaultdict(int),
+        "bySeverity": Counter(),
+        "byResourceType": Counter(),
         "subscriptions": set(),
     })
 
     for finding in findings:
         # Extract year-month from executionDate
         exec_date = finding.get("executionDate", "")
-        if len(exec_date) >= 7:
-            month_key = exec_date[:7]  # "2026-01"
-        else:
+        if len(exec_date) < 7:
             continue
 
-        monthly_data[month_key]["totalFindings"] += 1
-        monthly_data[month_key]["totalCost"] += finding.get("estimatedMonthlyCost", 0.0)
-        monthly_data[month_key]["bySeverity"][finding.get("severity", "unknown")] += 1
-        monthly_data[month_key]["byResourceType"][finding.get("resourceType", "unknown")] += 1
-        monthly_data[month_key]["subscriptions"].add(finding.get("subscriptionId", ""))
+        # Look up the month bucket once per finding
+        month = monthly_data[exec_date[:7]]  # "2026-01"
+        month["totalFindings"] += 1
+        month["totalCost"] += finding.get("estimatedMonthlyCost", 0.0)
+        month["bySeverity"][finding.get("severity", "unknown")] += 1
+        month["byResourceType"][finding.get("resourceType", "unknown")] += 1
+        month["subscriptions"].add(finding.get("subscriptionId", ""))
 
     # Convert to sorted list (most recent first)
     sorted_months = sorted(monthly_data.keys(), reverse=True)
@@ -9,7 +9,7 @@ from __future__ import annotations
 import logging
 from typing import Any
 
-from shared import CosmosClient
+from shared import get_cosmos_client
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +27,7 @@ def get_module_registry(include_disabled: bool = False) -> dict[str, Any]:
     """
     logger.info(f"Getting module registry (include_disabled={include_disabled})")
 
-    client = CosmosClient()
+    client = get_cosmos_client()
 
     if include_disabled:
         # Get all modules
@@ -11,7 +11,7 @@ import uuid
 from datetime import datetime, timezone
 from typing import Any
 
-from shared import CosmosClient
+from shared import get_cosmos_client
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +31,7 @@ def save_findings(
     Returns:
         Dictionary with:
             - saved: Number of findings saved
+            - failed: Number of findings that could not be written
             - executionId: The execution ID
             - moduleId: The module ID
     """
@@ -42,21 +43,38 @@ def save_findings(
         logger.info("No findings to save")
         return {
             "saved": 0,
+            "failed": 0,
             "executionId": execution_id,
             "moduleId": module_id,
         }
 
-    client = CosmosClient()
-    execution_date = datetime.now(timezone.utc)
+    client = get_cosmos_client()
+    execution_date = datetime.now(timezone.utc).isoformat()
+
+    # Drop repeats of the same finding within this request (keeping the first);
+    # each history record gets a fresh id, so a repeat would otherwise be
+    # stored twice. Findings without a findingId are always kept.
+    seen_ids: set[str] = set()
+    unique_findings = []
+    for finding in findings:
+        finding_id = finding.get("findingId")
+        if finding_id is not None:
+            if finding_id in seen_ids:
+                continue
+            seen_ids.add(finding_id)
+        unique_findings.append(finding)
+
+    if len(unique_findings) < len(findings):
+        logger.info(f"Skipping {len(findings) - len(unique_findings)} duplicate findings")
 
     # Transform findings to history records
     history_records = []
-    for finding in findings:
+    for finding in unique_findings:
         record = {
             "id": str(uuid.uuid4()),
             "findingId": finding.get("findingId"),
             "executionId": execution_id,
-            "executionDate": execution_date.isoformat(),
+            "executionDate": execution_date,
             "subscriptionId": finding.get("subscriptionId"),
             "moduleId": module_id,
             "resourceId": finding.get("resourceId"),
@@ -69,18 +87,23 @@ def save_findings(
             "estimatedMonthlyCost": finding.get("estimatedMonthlyCost", 0.0),
             "description": finding.get("description"),
             "status": "open",
-            "firstDetectedDate": finding.get("firstDetectedDate", execution_date.isoformat()),
+            "firstDetectedDate": finding.get("firstDetectedDate", execution_date),
             "ttl": 31536000,  # 365 days
         }
         history_records.append(record)
 
     # Save to Cosmos DB
     saved_count = client.save_findings(history_records)
+    # Items the client could not write are logged there and left out of the count
+    failed_count = len(history_records) - saved_count
 
     logger.info(f"Saved {saved_count} findings to history")
+    if failed_count:
+        logger.warning(f"Failed to save {failed_count} findings to history")
 
     return {
         "saved": saved_count,
+        "failed": failed_count,
         "executionId": execution_id,
         "moduleId": module_id,
     }
@@ -8,6 +8,8 @@ from __future__ import annotations
 
 import hashlib
 import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Any
 
@@ -19,6 +21,7 @@ from shared import (
     ModuleSummary,
     ResourceGraphClient,
     classify_severity,
+    get_resource_graph_client,
     get_confidence_level,
     should_report_finding,
 )
@@ -36,6 +39,20 @@ MODULE_ID = "abandoned-resources"
 MODULE_NAME = "Abandoned Resources"
 MODULE_VERSION = "1.0.0"
 
+# Concurrent resource-type queries; kept low to stay within Resource Graph throttling limits
+MAX_PARALLEL_QUERIES = 4
+
+# (level, message) pairs recorded on scan worker threads. The Functions host only
+# ties log records emitted on the invocation's own thread to the invocation, so
+# workers queue their messages and detect() logs them after collecting results.
+_ScanLog = list[tuple[int, str]]
+
+
+def _defer_log(scan_log: _ScanLog, level: int, message: str) -> None:
+    """Queue a message for logging on the invocation thread."""
+    if logger.isEnabledFor(level):
+        scan_log.append((level, message))
+
 
 def _generate_finding_id(resource_id: str, execution_id: str) -> str:
     """Generate a deterministic finding ID.
@@ -90,6 +107,7 @@ def _create_finding_from_resource(
     resource_type: str,
     execution_id: str,
     config: AbandonedResourcesConfig,
+    scan_log: _ScanLog,
 ) -> Finding | None:
     """Create a Finding from a Resource Graph query result.
 
@@ -98,6 +116,7 @@ def _create_finding_from_resource(
         resource_type: Azure resource type.
         execution_id: Current execution ID.
         config: Module configuration.
+        scan_log: Collects skip messages for logging on the invocation thread.
 
     Returns:
         Finding object, or None if finding should be skipped.
@@ -130,7 +149,11 @@ def _create_finding_from_resource(
 
     # Skip low confidence findings if configured
     if not should_report_finding(confidence_score, minimum_threshold=25):
-        logger.debug(f"Skipping low confidence finding: {resource_id} (score={confidence_score})")
+        _defer_log(
+            scan_log,
+            logging.DEBUG,
+            f"Skipping low confidence finding: {resource_id} (score={confidence_score})",
+        )
         return None
 
     confidence_level = get_confidence_level(confidence_score)
@@ -145,7 +168,7 @@ def _create_finding_from_resource(
 
     # Skip zero-cost resources if not configured to include them
     if estimated_cost == 0 and not config.include_zero_cost:
-        logger.debug(f"Skipping zero-cost resource: {resource_id}")
+        _defer_log(scan_log, logging.DEBUG, f"Skipping zero-cost resource: {resource_id}")
         return None
 
     # Classify severity based on cost
@@ -190,32 +213,102 @@ def _create_summary(findings: list[Finding], subscriptions_scanned: int) -> Modu
     Returns:
         ModuleSummary object.
     """
-    total_cost = sum(f.estimated_monthly_cost for f in findings)
-
-    # Count by severity
-    by_severity: dict[str, int] = {}
-    for f in findings:
-        severity = f.severity.value if hasattr(f.severity, "value") else f.severity
-        by_severity[severity] = by_severity.get(severity, 0) + 1
-
-    # Count by resource type
-    by_resource_type: dict[str, int] = {}
+    # Accumulate every aggregate in a single pass over the findings
+    total_cost = 0.0
+    by_severity: Counter[str] = Counter()
+    by_resource_type: Counter[str] = Counter()
+    subscriptions: set[str] = set()
     for f in findings:
-        by_resource_type[f.resource_type] = by_resource_type.get(f.resource_type, 0) + 1
+        total_cost += f.estimated_monthly_cost
+        by_severity[getattr(f.severity, "value", f.severity)] += 1
+        by_resource_type[f.resource_type] += 1
+        subscriptions.add(f.subscription_id)
 
     # Count unique subscriptions with findings
-    subscriptions_with_findings = len(set(f.subscription_id for f in findings))
+    subscriptions_with_findings = len(subscriptions)
 
     return ModuleSummary(
         totalFindings=len(findings),
         totalEstimatedMonthlySavings=total_cost,
-        findingsBySeverity=by_severity,
-        findingsByResourceType=by_resource_type,
+        findingsBySeverity=dict(by_severity),
+        findingsByResourceType=dict(by_resource_type),
         subscriptionsWithFindings=subscriptions_with_findings,
         subscriptionsClean=subscriptions_scanned - subscriptions_with_findings,
     )
 
 
+def _scan_resource_type(
+    graph_client: ResourceGraphClient,
+    resource_type: str,
+    subscription_ids: list[str],
+    execution_id: str,
+    config: AbandonedResourcesConfig,
+    dry_run: bool,
+) -> tuple[list[Finding], list[str], _ScanLog]:
+    """Query a single resource type and build findings from the results.
+
+    Rows are turned into findings as Resource Graph pages stream in, so
+    only the findings (not every raw row) are held in memory.
+
+    Args:
+        graph_client: Resource Graph client.
+        resource_type: Azure resource type to scan.
+        subscription_ids: Subscriptions to query.
+        execution_id: Current execution ID.
+        config: Module configuration.
+        dry_run: If True, skip the query and return no results.
+
+    Returns:
+        Tuple of (findings, per-resource error messages, log messages to emit
+        on the invocation thread). Findings and errors are empty if no query
+        is defined for the resource type.
+    """
+    findings: list[Finding] = []
+    errors: list[str] = []
+    scan_log: _ScanLog = []
+    _defer_log(scan_log, logging.INFO, f"Scanning for {resource_type}")
+
+    # Get query for this resource type
+    query = get_query_for_resource_type(resource_type)
+    if not query:
+        _defer_log(
+            scan_log, logging.WARNING, f"No query defined for resource type: {resource_type}"
+        )
+        return findings, errors, scan_log
+
+    # Execute query
+    if dry_run:
+        _defer_log(scan_log, logging.INFO, f"[DRY RUN] Would execute query for {resource_type}")
+        results = iter(())
+    elif not subscription_ids:
+        results = iter(())
+    else:
+        results = graph_client.query_batched_iter(query, subscription_ids)
+
+    # Create findings from results
+    resource_count = 0
+    for resource in results:
+        resource_count += 1
+        try:
+            finding = _create_finding_from_resource(
+                resource=resource,
+                resource_type=resource_type,
+                execution_id=execution_id,
+                config=config,
+                scan_log=scan_log,
+            )
+            if finding:
+                findings.append(finding)
+        except Exception as e:
+            resource_id = resource.get("id", "unknown")
+            error_msg = f"Error processing resource {resource_id}: {e}"
+            _defer_log(scan_log, logging.ERROR, error_msg)
+            errors.append(error_msg)
+
+    _defer_log(scan_log, logging.INFO, f"Found {resource_count} {resource_type} resources")
+    return findings, errors, scan_log
+
+
 def detect(module_input: ModuleInput) -> ModuleOutput:
     """Execute abandoned resources detection.
 
@@ -242,47 +335,36 @@ def detect(module_input: ModuleInput) -> ModuleOutput:
     logger.info(f"Configuration: resource_types={config.resource_types}")
 
     # Initialize clients
-    graph_client = ResourceGraphClient()
+    graph_client = get_resource_graph_client()
 
     all_findings: list[Finding] = []
     errors: list[str] = []
 
+    # Each resource type is an independent Resource Graph round trip, so run
+    # the queries concurrently and process results in configuration order
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_QUERIES) as executor:
+        pending = {
+            resource_type: executor.submit(
+                _scan_resource_type,
+                graph_client,
+                resource_type,
+                subscription_ids,
+                execution_id,
+                config,
+                dry_run,
+            )
+            for resource_type in config.resource_types
+        }
+
     # Process each resource type
-    for resource_type in config.resource_types:
+    for resource_type, future in pending.items():
         try:
-            logger.info(f"Scanning for {resource_type}")
-
-            # Get query for this resource type
-            query = get_query_for_resource_type(resource_type)
-            if not query:
-                logger.warning(f"No query defined for resource type: {resource_type}")
-                continue
-
-            # Execute query
-            if dry_run:
-                logger.info(f"[DRY RUN] Would execute query for {resource_type}")
-                results = []
-            else:
-                results = graph_client.query_batched(query, subscription_ids)
-
-            logger.info(f"Found {len(results)} {resource_type} resources")
-
-            # Create findings from results
-            for resource in results:
-                try:
-                    finding = _create_finding_from_resource(
-                        resource=resource,
-                        resource_type=resource_type,
-                        execution_id=execution_id,
-                        config=config,
-                    )
-                    if finding:
-                        all_findings.append(finding)
-                except Exception as e:
-                    resource_id = resource.get("id", "unknown")
-                    error_msg = f"Error processing resource {resource_id}: {e}"
-                    logger.error(error_msg)
-                    errors.append(error_msg)
+            findings, scan_errors, scan_log = future.result()
+            for level, message in scan_log:
+                logger.log(level, message)
+
+            all_findings.extend(findings)
+            errors.extend(scan_errors)
 
         except Exception as e:
             error_msg = f"Error scanning {resource_type}: {e}"
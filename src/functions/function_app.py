@@ -8,24 +8,202 @@ This module provides HTTP-triggered Azure Functions for:
 
 from __future__ import annotations
 
+import functools
+import gzip
 import json
 import logging
 import os
-import urllib.request
-import urllib.error
+import time
+from typing import Callable, Hashable
 
 import azure.functions as func
+from pydantic import ValidationError
 
 from data_layer.get_module_registry import get_module_registry
 from data_layer.save_findings import save_findings
 from data_layer.get_findings_history import get_findings_history
 from data_layer.get_findings_trends import get_findings_trends
 from data_layer.get_detection_targets import get_detection_targets
-from detection_layer.abandoned_resources import detect_from_dict
+from shared import ModuleInput, SaveFindingsRequest, TargetType
 
 app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
 logger = logging.getLogger(__name__)
 
+Handler = Callable[[func.HttpRequest], func.HttpResponse]
+
+
+# =============================================================================
+# Request Helpers
+# =============================================================================
+
+
+def _qbool(req: func.HttpRequest, name: str, default: bool = False) -> bool:
+    """Read a boolean query parameter ('true', case-insensitive)."""
+    value = req.params.get(name)
+    if value is None:
+        return default
+    return value.lower() == "true"
+
+
+def _qint(req: func.HttpRequest, name: str, default: int) -> int:
+    """Read an integer query parameter."""
+    value = req.params.get(name)
+    if value is None:
+        return default
+    return int(value)
+
+
+def _encode_json(payload: object) -> bytes:
+    """Encode a response payload as compact UTF-8 JSON."""
+    return json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+
+
+# Responses smaller than this are sent uncompressed
+_GZIP_MIN_BYTES = 1024
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Check whether an Accept-Encoding header allows a gzip response.
+
+    An explicit gzip entry decides; otherwise a "*" entry does. Entries with
+    q=0 are refusals.
+    """
+    wildcard = False
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        name = name.strip().lower()
+        if name not in ("gzip", "*"):
+            continue
+        quality = 1.0
+        key, _, value = params.partition("=")
+        if key.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        if name == "gzip":
+            return quality > 0
+        wildcard = quality > 0
+    return wildcard
+
+
+def _json_response(
+    payload: object,
+    req: func.HttpRequest | None = None,
+    status_code: int = 200,
+) -> func.HttpResponse:
+    """Serialize a JSON response, gzip-compressing it when the client accepts gzip."""
+    body = _encode_json(payload)
+    # The body depends on Accept-Encoding, so shared caches must key on it
+    headers = {"Vary": "Accept-Encoding"}
+    if (
+        req is not None
+        and len(body) > _GZIP_MIN_BYTES
+        and _accepts_gzip(req.headers.get("Accept-Encoding", ""))
+    ):
+        body = gzip.compress(body, compresslevel=1)
+        headers["Content-Encoding"] = "gzip"
+    return func.HttpResponse(
+        body,
+        headers=headers,
+        mimetype="application/json",
+        status_code=status_code,
+    )
+
+
+# Module registry and detection targets change rarely; serve their
+# serialized responses from memory for a short window
+_RESPONSE_CACHE_TTL_SECONDS = 60.0
+_response_cache: dict[Hashable, tuple[float, bytes]] = {}
+
+
+def _cached_json_response(key: Hashable, producer: Callable[[], object]) -> func.HttpResponse:
+    """Return a JSON response, reusing the serialized body while it is fresh.
+
+    Args:
+        key: Cache key identifying the endpoint and its parameters.
+        producer: Called to build the payload on a cache miss.
+    """
+    now = time.monotonic()
+    cached = _response_cache.get(key)
+    if cached is not None and cached[0] > now:
+        body = cached[1]
+    else:
+        body = _encode_json(producer())
+        _response_cache[key] = (now + _RESPONSE_CACHE_TTL_SECONDS, body)
+    return func.HttpResponse(body, mimetype="application/json", status_code=200)
+
+
+def _error_body(message: str) -> bytes:
+    """Serialize an error payload."""
+    return json.dumps({"error": message}).encode("utf-8")
+
+
+def _handle_errors(log_message: str) -> Callable[[Handler], Handler]:
+    """Wrap a handler so unhandled exceptions are logged and returned as a 500.
+
+    Args:
+        log_message: Message logged (with traceback) when the handler fails.
+    """
+
+    def decorator(handler: Handler) -> Handler:
+        @functools.wraps(handler)
+        def wrapper(req: func.HttpRequest) -> func.HttpResponse:
+            try:
+                return handler(req)
+            except Exception as e:
+                logger.exception(log_message)
+                return func.HttpResponse(
+                    _error_body(str(e)),
+                    mimetype="application/json",
+                    status_code=500,
+                )
+
+        return wrapper
+
+    return decorator
+
+
+# Static validation errors, serialized once at import time
+_ERR_INVALID_JSON = _error_body("Invalid JSON body")
+_ERR_BODY_NOT_OBJECT = _error_body("Request body must be a JSON object")
+_ERR_SAVE_FINDINGS_REQUIRED = _error_body("executionId and moduleId are required")
+_ERR_SUBSCRIPTION_ID_REQUIRED = _error_body("subscription_id is required")
+_ERR_MODULE_ID_REQUIRED = _error_body("module_id is required")
+_ERR_DETECTION_REQUIRED = _error_body("executionId and subscriptionIds are required")
+_ERR_LOGIC_APP_URL_MISSING = _error_body("LOGIC_APP_URL environment variable not configured")
+_ERR_EMAIL_REQUIRED = _error_body("ownerEmails, subscriptionId, and findings are required")
+_ERR_INVALID_TARGET_TYPE = _error_body(
+    f"target_type must be one of: {', '.join(t.value for t in TargetType)}"
+)
+
+
+def _validation_error_response(
+    exc: ValidationError,
+    required_error: bytes,
+) -> func.HttpResponse:
+    """Map a request body validation failure to a 400 response.
+
+    Args:
+        exc: Validation error raised while parsing the body.
+        required_error: Serialized error returned when required fields are missing.
+    """
+    errors = exc.errors()
+    if any(error["type"] == "json_invalid" for error in errors):
+        body = _ERR_INVALID_JSON
+    elif any(error["type"] == "model_type" for error in errors):
+        body = _ERR_BODY_NOT_OBJECT
+    elif all(error["type"] in ("missing", "string_too_short") for error in errors):
+        body = required_error
+    else:
+        body = _error_body(
+            "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or 'body'}: {error['msg']}"
+                for error in errors
+            )
+        )
+    return func.HttpResponse(body, mimetype="application/json", status_code=400)
+
 
 # =============================================================================
 # HTTP Endpoints
@@ -33,203 +211,150 @@ logger = logging.getLogger(__name__)
 
 
 @app.route(route="get-module-registry", methods=["GET"])
+@_handle_errors("Error getting module registry")
 def get_module_registry_handler(req: func.HttpRequest) -> func.HttpResponse:
     """Get all enabled modules from the registry."""
-    try:
-        include_disabled = req.params.get("include_disabled", "false").lower() == "true"
-        result = get_module_registry(include_disabled=include_disabled)
-        return func.HttpResponse(
-            json.dumps(result, default=str),
-            mimetype="application/json",
-            status_code=200,
-        )
-    except Exception as e:
-        logger.exception("Error getting module registry")
-        return func.HttpResponse(
-            json.dumps({"error": str(e)}),
-            mimetype="application/json",
-            status_code=500,
-        )
+    include_disabled = _qbool(req, "include_disabled")
+    return _cached_json_response(
+        ("get-module-registry", include_disabled),
+        lambda: get_module_registry(include_disabled=include_disabled),
+    )
 
 
 @app.route(route="save-findings", methods=["POST"])
+@_handle_errors("Error saving findings")
 def save_findings_handler(req: func.HttpRequest) -> func.HttpResponse:
     """Save findings to the findings-history container."""
     try:
-        body = req.get_json()
-    except ValueError:
-        return func.HttpResponse(
-            json.dumps({"error": "Invalid JSON body"}),
-            mimetype="application/json",
-            status_code=400,
-        )
-
-    try:
-        execution_id = body.get("executionId")
-        module_id = body.get("moduleId")
-        findings = body.get("findings", [])
-
-        if not execution_id or not module_id:
-            return func.HttpResponse(
-                json.dumps({"error": "executionId and moduleId are required"}),
-                mimetype="application/json",
-                status_code=400,
-            )
-
-        result = save_findings(
-            execution_id=execution_id,
-            module_id=module_id,
-            findings=findings,
-        )
-        return func.HttpResponse(
-            json.dumps(result, default=str),
-            mimetype="application/json",
-            status_code=200,
-        )
-    except Exception as e:
-        logger.exception("Error saving findings")
-        return func.HttpResponse(
-            json.dumps({"error": str(e)}),
-            mimetype="application/json",
-            status_code=500,
-        )
+        body = SaveFindingsRequest.model_validate_json(req.get_body())
+    except ValidationError as e:
+        return _validation_error_response(e, _ERR_SAVE_FINDINGS_REQUIRED)
+
+    result = save_findings(
+        execution_id=body.execution_id,
+        module_id=body.module_id,
+        findings=body.findings,
+    )
+    return func.HttpResponse(
+        _encode_json(result),
+        mimetype="application/json",
+        status_code=200,
+    )
 
 
 @app.route(route="get-findings-history", methods=["GET"])
+@_handle_errors("Error getting findings history")
 def get_findings_history_handler(req: func.HttpRequest) -> func.HttpResponse:
     """Get findings history for trend analysis."""
     subscription_id = req.params.get("subscription_id")
     if not subscription_id:
         return func.HttpResponse(
-            json.dumps({"error": "subscription_id is required"}),
+            _ERR_SUBSCRIPTION_ID_REQUIRED,
             mimetype="application/json",
             status_code=400,
         )
 
-    try:
-        limit = int(req.params.get("limit", "100"))
-        status = req.params.get("status")
+    limit = _qint(req, "limit", 100)
+    status = req.params.get("status")
 
-        result = get_findings_history(
-            subscription_id=subscription_id,
-            limit=limit,
-            status=status,
-        )
-        return func.HttpResponse(
-            json.dumps(result, default=str),
-            mimetype="application/json",
-            status_code=200,
-        )
-    except Exception as e:
-        logger.exception("Error getting findings history")
-        return func.HttpResponse(
-            json.dumps({"error": str(e)}),
-            mimetype="application/json",
-            status_code=500,
-        )
+    result = get_findings_history(
+        subscription_id=subscription_id,
+        limit=limit,
+        status=status,
+    )
+    return _json_response(result, req)
 
 
 @app.route(route="get-findings-trends", methods=["GET"])
+@_handle_errors("Error getting findings trends")
 def get_findings_trends_handler(req: func.HttpRequest) -> func.HttpResponse:
     """Get month-over-month findings trends."""
     module_id = req.params.get("module_id")
     if not module_id:
         return func.HttpResponse(
-            json.dumps({"error": "module_id is required"}),
+            _ERR_MODULE_ID_REQUIRED,
             mimetype="application/json",
             status_code=400,
         )
 
-    try:
-        months = int(req.params.get("months", "3"))
-        subscription_id = req.params.get("subscription_id")
+    months = _qint(req, "months", 3)
+    subscription_id = req.params.get("subscription_id")
+
+    result = get_findings_trends(
+        module_id=module_id,
+        months=months,
+        subscription_id=subscription_id,
+    )
+    return _json_response(result, req)
 
-        result = get_findings_trends(
-            module_id=module_id,
-            months=months,
-            subscription_id=subscription_id,
-        )
-        return func.HttpResponse(
-            json.dumps(result, default=str),
-            mimetype="application/json",
-            status_code=200,
-        )
-    except Exception as e:
-        logger.exception("Error getting findings trends")
-        return func.HttpResponse(
-            json.dumps({"error": str(e)}),
-            mimetype="application/json",
-            status_code=500,
-        )
+
+# Accepted values of the get-detection-targets target_type filter
+_TARGET_TYPES = frozenset(t.value for t in TargetType)
 
 
 @app.route(route="get-detection-targets", methods=["GET"])
+@_handle_errors("Error getting detection targets")
 def get_detection_targets_handler(req: func.HttpRequest) -> func.HttpResponse:
     """Get detection targets (subscriptions and management groups to scan)."""
-    try:
-        include_disabled = req.params.get("include_disabled", "false").lower() == "true"
-        target_type = req.params.get("target_type")
+    include_disabled = _qbool(req, "include_disabled")
+    target_type = req.params.get("target_type") or None
 
-        result = get_detection_targets(
-            include_disabled=include_disabled,
-            target_type=target_type,
-        )
+    # Validate before the cache lookup so arbitrary values cannot add cache entries
+    if target_type is not None and target_type not in _TARGET_TYPES:
         return func.HttpResponse(
-            json.dumps(result, default=str),
+            _ERR_INVALID_TARGET_TYPE,
             mimetype="application/json",
-            status_code=200,
-        )
-    except Exception as e:
-        logger.exception("Error getting detection targets")
-        return func.HttpResponse(
-            json.dumps({"error": str(e)}),
-            mimetype="application/json",
-            status_code=500,
+            status_code=400,
         )
 
+    return _cached_json_response(
+        ("get-detection-targets", include_disabled, target_type),
+        lambda: get_detection_targets(
+            include_disabled=include_disabled,
+            target_type=target_type,
+        ),
+    )
+
 
 @app.route(route="abandoned-resources", methods=["POST"])
+@_handle_errors("Error running abandoned resources detection")
 def abandoned_resources_handler(req: func.HttpRequest) -> func.HttpResponse:
     """Run the abandoned resources detection module."""
-    try:
-        body = req.get_json()
-    except ValueError:
-        return func.HttpResponse(
-            json.dumps({"error": "Invalid JSON body"}),
-            mimetype="application/json",
-            status_code=400,
-        )
+    # Deferred: pulls in the Resource Graph SDK, which only this handler needs
+    from detection_layer.abandoned_resources import detect
 
     try:
-        if not body.get("executionId") or not body.get("subscriptionIds"):
-            return func.HttpResponse(
-                json.dumps({"error": "executionId and subscriptionIds are required"}),
-                mimetype="application/json",
-                status_code=400,
-            )
+        module_input = ModuleInput.model_validate_json(req.get_body())
+    except ValidationError as e:
+        return _validation_error_response(e, _ERR_DETECTION_REQUIRED)
 
-        result = detect_from_dict(body)
+    if not module_input.execution_id or not module_input.subscription_ids:
         return func.HttpResponse(
-            json.dumps(result, default=str),
+            _ERR_DETECTION_REQUIRED,
             mimetype="application/json",
-            status_code=200,
-        )
-    except Exception as e:
-        logger.exception("Error running abandoned resources detection")
-        return func.HttpResponse(
-            json.dumps({"error": str(e)}),
-            mimetype="application/json",
-            status_code=500,
+            status_code=400,
         )
 
+    # Serialize straight from the model; skips building an intermediate dict
+    output = detect(module_input)
+    return func.HttpResponse(
+        output.model_dump_json(by_alias=True),
+        mimetype="application/json",
+        status_code=200,
+    )
+
 
 @app.route(route="send-optimization-email", methods=["POST"])
+@_handle_errors("Error sending optimization email")
 def send_optimization_email_handler(req: func.HttpRequest) -> func.HttpResponse:
     """Send optimization report email via Logic App."""
+    import urllib.error
+    import urllib.request
+
     logic_app_url = os.environ.get("LOGIC_APP_URL")
     if not logic_app_url:
         return func.HttpResponse(
-            json.dumps({"error": "LOGIC_APP_URL environment variable not configured"}),
+            _ERR_LOGIC_APP_URL_MISSING,
             mimetype="application/json",
             status_code=503,
         )
@@ -238,7 +363,7 @@ def send_optimization_email_handler(req: func.HttpRequest) -> func.HttpResponse:
         body = req.get_json()
     except ValueError:
         return func.HttpResponse(
-            json.dumps({"error": "Invalid JSON body"}),
+            _ERR_INVALID_JSON,
             mimetype="application/json",
             status_code=400,
         )
@@ -246,18 +371,24 @@ def send_optimization_email_handler(req: func.HttpRequest) -> func.HttpResponse:
     owner_emails = body.get("ownerEmails", [])
     if not owner_emails or not body.get("subscriptionId") or not body.get("findings"):
         return func.HttpResponse(
-            json.dumps({"error": "ownerEmails, subscriptionId, and findings are required"}),
+            _ERR_EMAIL_REQUIRED,
             mimetype="application/json",
             status_code=400,
         )
 
     # Add recommendations to findings if not present
+    added_recommendations = False
     for finding in body.get("findings", []):
         if "recommendation" not in finding:
             finding["recommendation"] = _get_recommendation(finding.get("resourceType", ""))
+            added_recommendations = True
 
     try:
-        request_data = json.dumps(body).encode("utf-8")
+        # Forward the caller's bytes unchanged unless the payload was modified
+        if added_recommendations:
+            request_data = _encode_json(body)
+        else:
+            request_data = req.get_body()
         request_obj = urllib.request.Request(
             logic_app_url,
             data=request_data,
@@ -275,21 +406,14 @@ def send_optimization_email_handler(req: func.HttpRequest) -> func.HttpResponse:
     except urllib.error.HTTPError as e:
         logger.exception("Logic App returned error")
         return func.HttpResponse(
-            json.dumps({"error": f"Logic App error: {e.code}"}),
+            _error_body(f"Logic App error: {e.code}"),
             mimetype="application/json",
             status_code=500,
         )
     except urllib.error.URLError as e:
         logger.exception("Failed to connect to Logic App")
         return func.HttpResponse(
-            json.dumps({"error": f"Connection error: {e.reason}"}),
-            mimetype="application/json",
-            status_code=500,
-        )
-    except Exception as e:
-        logger.exception("Error sending optimization email")
-        return func.HttpResponse(
-            json.dumps({"error": str(e)}),
+            _error_body(f"Connection error: {e.reason}"),
             mimetype="application/json",
             status_code=500,
         )
@@ -336,11 +460,11 @@ def _get_recommendation(resource_type: str) -> str:
 # =============================================================================
 
 
+# Static response body, serialized once at import time
+_HEALTH_BODY = json.dumps({"status": "healthy", "service": "optimization-agent"}).encode("utf-8")
+
+
 @app.route(route="health", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
 def health_check(req: func.HttpRequest) -> func.HttpResponse:
     """Health check endpoint."""
-    return func.HttpResponse(
-        json.dumps({"status": "healthy", "service": "optimization-agent"}),
-        mimetype="application/json",
-        status_code=200,
-    )
+    return func.HttpResponse(_HEALTH_BODY, mimetype="application/json", status_code=200)
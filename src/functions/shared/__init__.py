@@ -1,4 +1,14 @@
-"""Shared library for Azure Optimization Agent functions."""
+"""Shared library for Azure Optimization Agent functions.
+
+The Cosmos DB and Resource Graph clients are imported lazily on first
+access (PEP 562) so that handlers which never touch them do not pay for
+loading the Azure SDK packages during cold start.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
 
 from shared.models import (
     Finding,
@@ -9,13 +19,12 @@ from shared.models import (
     ExecutionLog,
     DetectionTarget,
     NotificationPreferences,
+    SaveFindingsRequest,
     FindingCategory,
     Severity,
     ConfidenceLevel,
     TargetType,
 )
-from shared.cosmos_client import CosmosClient
-from shared.resource_graph import ResourceGraphClient
 from shared.confidence import (
     get_confidence_level,
     clamp_score,
@@ -32,6 +41,18 @@ from shared.cost_calculator import (
     format_cost,
 )
 
+if TYPE_CHECKING:
+    from shared.cosmos_client import CosmosClient, get_cosmos_client
+    from shared.resource_graph import ResourceGraphClient, get_resource_graph_client
+
+# Heavy SDK-backed names, resolved on first attribute access
+_LAZY_IMPORTS = {
+    "CosmosClient": "shared.cosmos_client",
+    "get_cosmos_client": "shared.cosmos_client",
+    "ResourceGraphClient": "shared.resource_graph",
+    "get_resource_graph_client": "shared.resource_graph",
+}
+
 __all__ = [
     # Models
     "Finding",
@@ -42,6 +63,7 @@ __all__ = [
     "ExecutionLog",
     "DetectionTarget",
     "NotificationPreferences",
+    "SaveFindingsRequest",
     "FindingCategory",
     "Severity",
     "ConfidenceLevel",
@@ -49,6 +71,8 @@ __all__ = [
     # Clients
     "CosmosClient",
     "ResourceGraphClient",
+    "get_cosmos_client",
+    "get_resource_graph_client",
     # Confidence utilities
     "get_confidence_level",
     "clamp_score",
@@ -63,3 +87,13 @@ __all__ = [
     "summarize_by_resource_type",
     "format_cost",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """Import SDK-backed clients on first use."""
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
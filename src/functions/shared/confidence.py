@@ -7,8 +7,31 @@ be implemented within each detection module.
 
 from __future__ import annotations
 
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Final
+
 from shared.models import ConfidenceLevel
 
+# Standard confidence thresholds; read-only so the shared instance can be returned
+_THRESHOLDS: Final[Mapping[str, int]] = MappingProxyType({
+    "certain": 95,
+    "high": 75,
+    "medium": 50,
+    "low": 25,
+    "uncertain": 0,
+})
+
+# Confidence level for every valid score (0-100), indexed by score
+_LEVEL_TABLE: tuple[ConfidenceLevel, ...] = tuple(
+    ConfidenceLevel.CERTAIN if score >= 95
+    else ConfidenceLevel.HIGH if score >= 75
+    else ConfidenceLevel.MEDIUM if score >= 50
+    else ConfidenceLevel.LOW if score >= 25
+    else ConfidenceLevel.UNCERTAIN
+    for score in range(101)
+)
+
 
 def get_confidence_level(score: int) -> ConfidenceLevel:
     """Convert a numeric confidence score to a confidence level.
@@ -25,17 +48,10 @@ def get_confidence_level(score: int) -> ConfidenceLevel:
         - Medium: 50-74
         - Low: 25-49
         - Uncertain: 0-24
+
+    Scores outside 0-100 are clamped before lookup.
     """
-    if score >= 95:
-        return ConfidenceLevel.CERTAIN
-    elif score >= 75:
-        return ConfidenceLevel.HIGH
-    elif score >= 50:
-        return ConfidenceLevel.MEDIUM
-    elif score >= 25:
-        return ConfidenceLevel.LOW
-    else:
-        return ConfidenceLevel.UNCERTAIN
+    return _LEVEL_TABLE[clamp_score(int(score))]
 
 
 def clamp_score(score: int, minimum: int = 0, maximum: int = 100) -> int:
@@ -65,16 +81,11 @@ def should_report_finding(confidence_score: int, minimum_threshold: int = 25) ->
     return confidence_score >= minimum_threshold
 
 
-def get_confidence_thresholds() -> dict[str, int]:
+def get_confidence_thresholds() -> Mapping[str, int]:
     """Get the standard confidence level thresholds.
 
     Returns:
-        Dictionary mapping level names to minimum scores.
+        Read-only mapping of level names to minimum scores. Use dict() on
+        the result if a mutable copy is needed.
     """
-    return {
-        "certain": 95,
-        "high": 75,
-        "medium": 50,
-        "low": 25,
-        "uncertain": 0,
-    }
+    return _THRESHOLDS
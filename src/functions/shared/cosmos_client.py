@@ -2,12 +2,68 @@
 
 from __future__ import annotations
 
+import copy
+import functools
+import logging
 import os
-from typing import Any
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Final
 
 from azure.cosmos import CosmosClient as AzureCosmosClient
-from azure.cosmos.exceptions import CosmosResourceNotFoundError
-from azure.identity import DefaultAzureCredential
+from azure.cosmos.exceptions import (
+    CosmosBatchOperationError,
+    CosmosHttpResponseError,
+    CosmosResourceNotFoundError,
+)
+
+from shared.credential import get_default_credential
+from shared.transport import get_http_transport
+
+logger = logging.getLogger(__name__)
+
+# Queries are module-level constants so the text sent to Cosmos DB is identical
+# across calls (maximizing server-side query plan reuse); values are always
+# passed as parameters.
+_Q_ALL: Final[str] = "SELECT * FROM c"
+_Q_ENABLED_MODULES: Final[str] = "SELECT * FROM c WHERE c.enabled = true AND c.status = 'active'"
+_Q_FINDINGS_BY_SUBSCRIPTION: Final[str] = (
+    "SELECT TOP @limit * FROM c "
+    "WHERE c.subscriptionId = @subscriptionId "
+    "ORDER BY c.executionDate DESC"
+)
+_Q_FINDINGS_BY_SUBSCRIPTION_AND_STATUS: Final[str] = (
+    "SELECT TOP @limit * FROM c "
+    "WHERE c.subscriptionId = @subscriptionId AND c.status = @status "
+    "ORDER BY c.executionDate DESC"
+)
+_Q_FINDINGS_BY_EXECUTION: Final[str] = "SELECT * FROM c WHERE c.executionId = @executionId"
+_Q_OPEN_FINDING_BY_RESOURCE: Final[str] = (
+    "SELECT TOP 1 * FROM c "
+    "WHERE c.resourceId = @resourceId AND c.status = 'open' "
+    "ORDER BY c.executionDate DESC"
+)
+_Q_RECENT_EXECUTIONS: Final[str] = (
+    "SELECT * FROM c ORDER BY c.startTime DESC OFFSET 0 LIMIT @limit"
+)
+_Q_ENABLED_TARGETS: Final[str] = "SELECT * FROM c WHERE c.enabled = true"
+_Q_TARGETS_BY_TYPE: Final[str] = (
+    "SELECT * FROM c WHERE c.targetType = @targetType AND c.enabled = true"
+)
+_Q_TRENDS: Final[str] = (
+    "SELECT c.executionDate, c.estimatedMonthlyCost, c.severity, "
+    "c.resourceType, c.subscriptionId FROM c "
+    "WHERE c.moduleId = @moduleId "
+    "AND c.executionDate >= @fromDate AND c.executionDate <= @toDate"
+)
+_Q_TRENDS_BY_SUBSCRIPTION: Final[str] = (
+    "SELECT c.executionDate, c.estimatedMonthlyCost, c.severity, "
+    "c.resourceType, c.subscriptionId FROM c "
+    "WHERE c.moduleId = @moduleId AND c.subscriptionId = @subscriptionId "
+    "AND c.executionDate >= @fromDate AND c.executionDate <= @toDate"
+)
 
 
 class CosmosClient:
@@ -19,69 +75,203 @@ class CosmosClient:
     EXECUTION_LOGS = "execution-logs"
     DETECTION_TARGETS = "detection-targets"
 
+    # Cosmos DB limit on operations in a single transactional batch
+    MAX_BATCH_OPERATIONS = 100
+
+    # Cosmos DB limit on operations in a single patch request
+    MAX_PATCH_OPERATIONS = 10
+
+    # Default number of batches written concurrently
+    DEFAULT_MAX_CONCURRENCY = 8
+
+    # Point reads of modules and targets are cached for this many seconds
+    POINT_READ_CACHE_TTL = 300.0
+    POINT_READ_CACHE_MAX_ITEMS = 1024
+
     def __init__(
         self,
         endpoint: str | None = None,
         database_name: str | None = None,
         credential: Any | None = None,
+        max_concurrency: int | None = None,
     ):
         """Initialize Cosmos DB client.
 
         Args:
             endpoint: Cosmos DB endpoint URL. Defaults to COSMOS_ENDPOINT env var.
             database_name: Database name. Defaults to COSMOS_DATABASE env var.
-            credential: Azure credential. Defaults to DefaultAzureCredential.
+            credential: Azure credential. Defaults to the shared credential from
+                get_default_credential().
+            max_concurrency: Maximum batches written in parallel by save_findings.
+                Defaults to COSMOS_MAX_CONCURRENCY env var, or 8.
+
+        Set COSMOS_PREFERRED_LOCATIONS (comma-separated region names, e.g.
+        "West US 2,East US") to prefer specific replicas for reads.
         """
         self.endpoint = endpoint or os.environ.get("COSMOS_ENDPOINT")
         self.database_name = database_name or os.environ.get("COSMOS_DATABASE", "optimization-agent")
+        self.max_concurrency = max_concurrency or int(
+            os.environ.get("COSMOS_MAX_CONCURRENCY", self.DEFAULT_MAX_CONCURRENCY)
+        )
 
         if not self.endpoint:
             raise ValueError("COSMOS_ENDPOINT environment variable or endpoint parameter required")
 
-        self.credential = credential or DefaultAzureCredential()
-        self._client = AzureCosmosClient(self.endpoint, credential=self.credential)
+        # Route requests to the nearest replica first (e.g. the Function App's region)
+        preferred_locations = [
+            location.strip()
+            for location in os.environ.get("COSMOS_PREFERRED_LOCATIONS", "").split(",")
+            if location.strip()
+        ]
+
+        self.credential = credential or get_default_credential()
+        self._client = AzureCosmosClient(
+            self.endpoint,
+            credential=self.credential,
+            preferred_locations=preferred_locations or None,
+            transport=get_http_transport(),
+        )
         self._database = self._client.get_database_client(self.database_name)
+        self._containers = {
+            name: self._database.get_container_client(name)
+            for name in (
+                self.MODULE_REGISTRY,
+                self.FINDINGS_HISTORY,
+                self.EXECUTION_LOGS,
+                self.DETECTION_TARGETS,
+            )
+        }
+
+        self._read_cache: dict[tuple[str, str], tuple[float, dict[str, Any] | None]] = {}
+        self._read_cache_lock = threading.Lock()
 
     def _get_container(self, container_name: str):
-        """Get a container client."""
-        return self._database.get_container_client(container_name)
+        """Get a container client (proxies are created once in __init__)."""
+        return self._containers[container_name]
+
+    def _cached_read(self, container_name: str, item_id: str) -> dict[str, Any] | None:
+        """Point-read an item whose ID is also its partition key, with a TTL cache.
+
+        Returns a copy so callers cannot mutate the cached document. Missing
+        items are cached as None.
+        """
+        key = (container_name, item_id)
+        now = time.monotonic()
+        with self._read_cache_lock:
+            cached = self._read_cache.get(key)
+        if cached is not None and cached[0] > now:
+            return copy.deepcopy(cached[1])
+
+        container = self._get_container(container_name)
+        try:
+            item = container.read_item(item=item_id, partition_key=item_id)
+        except CosmosResourceNotFoundError:
+            item = None
+
+        with self._read_cache_lock:
+            cache_full = len(self._read_cache) >= self.POINT_READ_CACHE_MAX_ITEMS
+            if key not in self._read_cache and cache_full:
+                # Evict the oldest entry (dicts preserve insertion order)
+                del self._read_cache[next(iter(self._read_cache))]
+            self._read_cache[key] = (now + self.POINT_READ_CACHE_TTL, item)
+        return copy.deepcopy(item)
+
+    def _invalidate_read(self, container_name: str, item_id: str) -> None:
+        """Drop a cached point read after the item changes."""
+        with self._read_cache_lock:
+            self._read_cache.pop((container_name, item_id), None)
 
     # Module Registry operations
     def get_enabled_modules(self) -> list[dict[str, Any]]:
         """Get all enabled modules from the registry."""
         container = self._get_container(self.MODULE_REGISTRY)
-        query = "SELECT * FROM c WHERE c.enabled = true AND c.status = 'active'"
-        return list(container.query_items(query, enable_cross_partition_query=True))
+        return list(container.query_items(_Q_ENABLED_MODULES, enable_cross_partition_query=True))
 
     def get_all_modules(self) -> list[dict[str, Any]]:
         """Get all modules from the registry (including disabled)."""
         container = self._get_container(self.MODULE_REGISTRY)
-        query = "SELECT * FROM c"
-        return list(container.query_items(query, enable_cross_partition_query=True))
+        return list(container.query_items(_Q_ALL, enable_cross_partition_query=True))
 
     def get_module(self, module_id: str) -> dict[str, Any] | None:
-        """Get a specific module by ID."""
-        container = self._get_container(self.MODULE_REGISTRY)
-        try:
-            return container.read_item(item=module_id, partition_key=module_id)
-        except CosmosResourceNotFoundError:
-            return None
+        """Get a specific module by ID (cached for POINT_READ_CACHE_TTL seconds)."""
+        return self._cached_read(self.MODULE_REGISTRY, module_id)
 
     def update_module_execution(self, module_id: str, execution_date: str) -> None:
         """Update the last execution date for a module."""
         container = self._get_container(self.MODULE_REGISTRY)
-        module = container.read_item(item=module_id, partition_key=module_id)
-        module["lastExecutionDate"] = execution_date
-        container.replace_item(item=module_id, body=module)
+        container.patch_item(
+            item=module_id,
+            partition_key=module_id,
+            patch_operations=[
+                {"op": "set", "path": "/lastExecutionDate", "value": execution_date}
+            ],
+        )
+        self._invalidate_read(self.MODULE_REGISTRY, module_id)
 
     # Findings History operations
     def save_findings(self, findings: list[dict[str, Any]]) -> int:
-        """Save findings to history. Returns count of saved items."""
+        """Save findings to history. Returns count of saved items.
+
+        Findings are grouped by subscription (the container's partition key)
+        and upserted as transactional batches of up to MAX_BATCH_OPERATIONS
+        items, so each batch costs one round trip instead of one per finding.
+        If a batch is rejected, its items are retried individually so one bad
+        record does not discard the rest of the batch. Items that still fail
+        are logged and not counted, so callers can compare the return value
+        with len(findings) to detect a partial save.
+
+        Batches are dispatched concurrently, up to max_concurrency at a time.
+        Throttled (429) requests are retried by the Cosmos SDK's own retry
+        policy, which honors the service's retry-after hint.
+        """
         container = self._get_container(self.FINDINGS_HISTORY)
-        saved = 0
+
+        by_subscription: dict[str, list[dict[str, Any]]] = defaultdict(list)
         for finding in findings:
-            container.upsert_item(finding)
-            saved += 1
+            by_subscription[finding.get("subscriptionId")].append(finding)
+
+        batches = [
+            (subscription_id, partition_findings[i : i + self.MAX_BATCH_OPERATIONS])
+            for subscription_id, partition_findings in by_subscription.items()
+            for i in range(0, len(partition_findings), self.MAX_BATCH_OPERATIONS)
+        ]
+
+        if len(batches) <= 1:
+            return sum(self._save_batch(container, *batch) for batch in batches)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            return sum(executor.map(lambda batch: self._save_batch(container, *batch), batches))
+
+    def _save_batch(
+        self,
+        container,
+        subscription_id: str,
+        batch: list[dict[str, Any]],
+    ) -> int:
+        """Upsert one partition's batch of findings. Returns count of saved items."""
+        try:
+            container.execute_item_batch(
+                batch_operations=[("upsert", (finding,)) for finding in batch],
+                partition_key=subscription_id,
+            )
+            return len(batch)
+        except CosmosBatchOperationError as e:
+            logger.warning(
+                f"Batch upsert failed for subscription {subscription_id} "
+                f"(operation {e.error_index}); retrying {len(batch)} items individually"
+            )
+            return self._upsert_each(container, batch)
+
+    @staticmethod
+    def _upsert_each(container, items: list[dict[str, Any]]) -> int:
+        """Upsert items one at a time. Returns count of items saved."""
+        saved = 0
+        for item in items:
+            try:
+                container.upsert_item(item)
+                saved += 1
+            except CosmosHttpResponseError as e:
+                logger.error(f"Failed to save finding {item.get('findingId')}: {e.message}")
         return saved
 
     def get_findings_by_subscription(
@@ -89,19 +279,13 @@ class CosmosClient:
     ) -> list[dict[str, Any]]:
         """Get recent findings for a subscription."""
         container = self._get_container(self.FINDINGS_HISTORY)
-        query = """
-            SELECT * FROM c
-            WHERE c.subscriptionId = @subscriptionId
-            ORDER BY c.executionDate DESC
-            OFFSET 0 LIMIT @limit
-        """
         parameters = [
             {"name": "@subscriptionId", "value": subscription_id},
             {"name": "@limit", "value": limit},
         ]
         return list(
             container.query_items(
-                query, parameters=parameters, partition_key=subscription_id
+                _Q_FINDINGS_BY_SUBSCRIPTION, parameters=parameters, partition_key=subscription_id
             )
         )
 
@@ -110,12 +294,6 @@ class CosmosClient:
     ) -> list[dict[str, Any]]:
         """Get findings for a subscription filtered by status."""
         container = self._get_container(self.FINDINGS_HISTORY)
-        query = """
-            SELECT * FROM c
-            WHERE c.subscriptionId = @subscriptionId AND c.status = @status
-            ORDER BY c.executionDate DESC
-            OFFSET 0 LIMIT @limit
-        """
         parameters = [
             {"name": "@subscriptionId", "value": subscription_id},
             {"name": "@status", "value": status},
@@ -123,32 +301,51 @@ class CosmosClient:
         ]
         return list(
             container.query_items(
-                query, parameters=parameters, partition_key=subscription_id
+                _Q_FINDINGS_BY_SUBSCRIPTION_AND_STATUS,
+                parameters=parameters,
+                partition_key=subscription_id,
             )
         )
 
     def get_findings_by_execution(self, execution_id: str) -> list[dict[str, Any]]:
         """Get all findings for a specific execution."""
         container = self._get_container(self.FINDINGS_HISTORY)
-        query = "SELECT * FROM c WHERE c.executionId = @executionId"
         parameters = [{"name": "@executionId", "value": execution_id}]
         return list(
-            container.query_items(query, parameters=parameters, enable_cross_partition_query=True)
+            container.query_items(
+                _Q_FINDINGS_BY_EXECUTION, parameters=parameters, enable_cross_partition_query=True
+            )
         )
 
-    def get_open_findings_by_resource(self, resource_id: str) -> dict[str, Any] | None:
-        """Get the most recent open finding for a resource."""
-        container = self._get_container(self.FINDINGS_HISTORY)
-        query = """
-            SELECT TOP 1 * FROM c
-            WHERE c.resourceId = @resourceId AND c.status = 'open'
-            ORDER BY c.executionDate DESC
+    def get_open_findings_by_resource(
+        self, resource_id: str, subscription_id: str | None = None
+    ) -> dict[str, Any] | None:
+        """Get the most recent open finding for a resource.
+
+        Findings are partitioned by subscription, and an ARM resource ID
+        embeds its subscription (/subscriptions/<id>/...), so the lookup is
+        scoped to that single partition. Only IDs without a subscription
+        segment fall back to a cross-partition query.
+
+        Args:
+            resource_id: Full ARM resource ID.
+            subscription_id: Subscription owning the resource. Defaults to the
+                one parsed from resource_id.
         """
+        container = self._get_container(self.FINDINGS_HISTORY)
         parameters = [{"name": "@resourceId", "value": resource_id}]
-        results = list(
-            container.query_items(query, parameters=parameters, enable_cross_partition_query=True)
-        )
-        return results[0] if results else None
+        subscription_id = subscription_id or _subscription_from_resource_id(resource_id)
+        if subscription_id:
+            items = container.query_items(
+                _Q_OPEN_FINDING_BY_RESOURCE, parameters=parameters, partition_key=subscription_id
+            )
+        else:
+            items = container.query_items(
+                _Q_OPEN_FINDING_BY_RESOURCE,
+                parameters=parameters,
+                enable_cross_partition_query=True,
+            )
+        return next(iter(items), None)
 
     # Execution Logs operations
     def create_execution_log(self, log: dict[str, Any]) -> None:
@@ -157,8 +354,27 @@ class CosmosClient:
         container.create_item(log)
 
     def update_execution_log(self, execution_id: str, updates: dict[str, Any]) -> None:
-        """Update an execution log entry."""
+        """Update an execution log entry.
+
+        Top-level fields are set with a single atomic patch, so concurrent
+        updates to different fields do not overwrite each other. Updates
+        touching more fields than one patch allows fall back to read+replace.
+        """
+        if not updates:
+            return
+
         container = self._get_container(self.EXECUTION_LOGS)
+        if len(updates) <= self.MAX_PATCH_OPERATIONS:
+            container.patch_item(
+                item=execution_id,
+                partition_key=execution_id,
+                patch_operations=[
+                    {"op": "set", "path": _json_pointer(field), "value": value}
+                    for field, value in updates.items()
+                ],
+            )
+            return
+
         log = container.read_item(item=execution_id, partition_key=execution_id)
         log.update(updates)
         container.replace_item(item=execution_id, body=log)
@@ -174,50 +390,43 @@ class CosmosClient:
     def get_recent_executions(self, limit: int = 10) -> list[dict[str, Any]]:
         """Get recent execution logs."""
         container = self._get_container(self.EXECUTION_LOGS)
-        query = """
-            SELECT * FROM c
-            ORDER BY c.startTime DESC
-            OFFSET 0 LIMIT @limit
-        """
         parameters = [{"name": "@limit", "value": limit}]
         return list(
-            container.query_items(query, parameters=parameters, enable_cross_partition_query=True)
+            container.query_items(
+                _Q_RECENT_EXECUTIONS, parameters=parameters, enable_cross_partition_query=True
+            )
         )
 
     # Detection Targets operations
     def get_enabled_targets(self) -> list[dict[str, Any]]:
         """Get all enabled detection targets."""
         container = self._get_container(self.DETECTION_TARGETS)
-        query = "SELECT * FROM c WHERE c.enabled = true"
-        return list(container.query_items(query, enable_cross_partition_query=True))
+        return list(container.query_items(_Q_ENABLED_TARGETS, enable_cross_partition_query=True))
 
     def get_all_targets(self) -> list[dict[str, Any]]:
         """Get all detection targets (including disabled)."""
         container = self._get_container(self.DETECTION_TARGETS)
-        query = "SELECT * FROM c"
-        return list(container.query_items(query, enable_cross_partition_query=True))
+        return list(container.query_items(_Q_ALL, enable_cross_partition_query=True))
 
     def get_target(self, target_id: str) -> dict[str, Any] | None:
-        """Get a specific detection target by ID."""
-        container = self._get_container(self.DETECTION_TARGETS)
-        try:
-            return container.read_item(item=target_id, partition_key=target_id)
-        except CosmosResourceNotFoundError:
-            return None
+        """Get a specific detection target by ID (cached for POINT_READ_CACHE_TTL seconds)."""
+        return self._cached_read(self.DETECTION_TARGETS, target_id)
 
     def get_targets_by_type(self, target_type: str) -> list[dict[str, Any]]:
         """Get all enabled targets of a specific type (subscription or managementGroup)."""
         container = self._get_container(self.DETECTION_TARGETS)
-        query = "SELECT * FROM c WHERE c.targetType = @targetType AND c.enabled = true"
         parameters = [{"name": "@targetType", "value": target_type}]
         return list(
-            container.query_items(query, parameters=parameters, enable_cross_partition_query=True)
+            container.query_items(
+                _Q_TARGETS_BY_TYPE, parameters=parameters, enable_cross_partition_query=True
+            )
         )
 
     def upsert_target(self, target: dict[str, Any]) -> None:
         """Create or update a detection target."""
         container = self._get_container(self.DETECTION_TARGETS)
         container.upsert_item(target)
+        self._invalidate_read(self.DETECTION_TARGETS, target["id"])
 
     # Trends operations
     def get_findings_for_trends(
@@ -236,20 +445,12 @@ class CosmosClient:
             subscription_id: Optional subscription ID to filter by
 
         Returns:
-            List of findings with executionDate, estimatedMonthlyCost, severity, resourceType
+            List of findings with executionDate, estimatedMonthlyCost, severity,
+            resourceType and subscriptionId (only the fields the trend aggregation reads)
         """
         container = self._get_container(self.FINDINGS_HISTORY)
 
         if subscription_id:
-            query = """
-                SELECT c.executionDate, c.estimatedMonthlyCost, c.severity,
-                       c.resourceType, c.subscriptionId, c.findingId
-                FROM c
-                WHERE c.moduleId = @moduleId
-                  AND c.subscriptionId = @subscriptionId
-                  AND c.executionDate >= @fromDate
-                  AND c.executionDate <= @toDate
-            """
             parameters = [
                 {"name": "@moduleId", "value": module_id},
                 {"name": "@subscriptionId", "value": subscription_id},
@@ -257,22 +458,57 @@ class CosmosClient:
                 {"name": "@toDate", "value": to_date},
             ]
             return list(
-                container.query_items(query, parameters=parameters, partition_key=subscription_id)
+                container.query_items(
+                    _Q_TRENDS_BY_SUBSCRIPTION, parameters=parameters, partition_key=subscription_id
+                )
             )
         else:
-            query = """
-                SELECT c.executionDate, c.estimatedMonthlyCost, c.severity,
-                       c.resourceType, c.subscriptionId, c.findingId
-                FROM c
-                WHERE c.moduleId = @moduleId
-                  AND c.executionDate >= @fromDate
-                  AND c.executionDate <= @toDate
-            """
             parameters = [
                 {"name": "@moduleId", "value": module_id},
                 {"name": "@fromDate", "value": from_date},
                 {"name": "@toDate", "value": to_date},
             ]
             return list(
-                container.query_items(query, parameters=parameters, enable_cross_partition_query=True)
+                container.query_items(
+                    _Q_TRENDS, parameters=parameters, enable_cross_partition_query=True
+                )
             )
+
+
+def _json_pointer(field: str) -> str:
+    """Build the patch path for a top-level field (RFC 6901 escaping)."""
+    return "/" + field.replace("~", "~0").replace("/", "~1")
+
+
+def _subscription_from_resource_id(resource_id: str) -> str | None:
+    """Extract the subscription ID from an ARM resource ID, if present."""
+    parts = resource_id.split("/")
+    # ["", "subscriptions", "<id>", ...]
+    if len(parts) > 2 and parts[1].lower() == "subscriptions" and parts[2]:
+        return parts[2]
+    return None
+
+
+def get_cosmos_client(
+    endpoint: str | None = None, database_name: str | None = None
+) -> CosmosClient:
+    """Get the process-wide CosmosClient for an account and database.
+
+    Function invocations on a warm host share one instance per
+    (endpoint, database) pair, so the SDK's connection pool and cached
+    tokens are reused instead of being rebuilt per request.
+
+    Args:
+        endpoint: Cosmos DB endpoint URL. Defaults to COSMOS_ENDPOINT env var.
+        database_name: Database name. Defaults to COSMOS_DATABASE env var.
+    """
+    return _cosmos_client_for(
+        endpoint or os.environ.get("COSMOS_ENDPOINT"),
+        database_name or os.environ.get("COSMOS_DATABASE", "optimization-agent"),
+    )
+
+
+@functools.cache
+def _cosmos_client_for(endpoint: str | None, database_name: str) -> CosmosClient:
+    """Build and memoize a CosmosClient per resolved (endpoint, database) pair."""
+    return CosmosClient(endpoint, database_name)
@@ -8,10 +8,22 @@ each detection module.
 
 from __future__ import annotations
 
+from bisect import bisect_left
+from collections import Counter
 from typing import Any
 
 from shared.models import Severity
 
+# Severity upper bounds (inclusive), ascending, and the level for each band
+_SEVERITY_BOUNDS = (1.0, 10.0, 100.0, 1000.0)
+_SEVERITY_LEVELS = (
+    Severity.INFORMATIONAL,
+    Severity.LOW,
+    Severity.MEDIUM,
+    Severity.HIGH,
+    Severity.CRITICAL,
+)
+
 
 def classify_severity(estimated_monthly_cost: float) -> Severity:
     """Classify severity based on monthly cost impact.
@@ -29,16 +41,9 @@ def classify_severity(estimated_monthly_cost: float) -> Severity:
         - Low: $1-$10/month
         - Informational: <$1/month
     """
-    if estimated_monthly_cost > 1000:
-        return Severity.CRITICAL
-    elif estimated_monthly_cost > 100:
-        return Severity.HIGH
-    elif estimated_monthly_cost > 10:
-        return Severity.MEDIUM
-    elif estimated_monthly_cost > 1:
-        return Severity.LOW
-    else:
-        return Severity.INFORMATIONAL
+    # bisect_left counts the bounds strictly below the cost, so a cost equal
+    # to a bound stays in the lower band (exactly $100/month is MEDIUM)
+    return _SEVERITY_LEVELS[bisect_left(_SEVERITY_BOUNDS, estimated_monthly_cost)]
 
 
 def get_severity_thresholds() -> dict[str, float]:
@@ -96,11 +101,7 @@ def summarize_by_severity(findings: list[dict[str, Any]]) -> dict[str, int]:
     Returns:
         Dictionary mapping severity to count.
     """
-    counts: dict[str, int] = {}
-    for finding in findings:
-        severity = finding.get("severity", "informational")
-        counts[severity] = counts.get(severity, 0) + 1
-    return counts
+    return dict(Counter(f.get("severity", "informational") for f in findings))
 
 
 def summarize_by_resource_type(findings: list[dict[str, Any]]) -> dict[str, int]:
@@ -112,11 +113,7 @@ def summarize_by_resource_type(findings: list[dict[str, Any]]) -> dict[str, int]
     Returns:
         Dictionary mapping resource type to count.
     """
-    counts: dict[str, int] = {}
-    for finding in findings:
-        resource_type = finding.get("resourceType", "unknown")
-        counts[resource_type] = counts.get(resource_type, 0) + 1
-    return counts
+    return dict(Counter(f.get("resourceType", "unknown") for f in findings))
 
 
 def format_cost(amount: float, currency: str = "USD") -> str:
@@ -0,0 +1,44 @@
+"""Shared Azure credential for the Azure SDK clients.
+
+On Azure the Function App authenticates with its managed identity, so the
+credential goes straight to it instead of letting DefaultAzureCredential
+probe developer tools (Azure CLI, VS Code, PowerShell, ...) first. Off Azure
+(local runs and the scripts in /scripts) DefaultAzureCredential is kept so
+`az login` continues to work.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+
+from azure.core.credentials import TokenCredential
+from azure.identity import (
+    ChainedTokenCredential,
+    DefaultAzureCredential,
+    EnvironmentCredential,
+    ManagedIdentityCredential,
+)
+
+# Set by the App Service / Functions host when a managed identity is available
+_MANAGED_IDENTITY_ENV_VARS = ("IDENTITY_ENDPOINT", "MSI_ENDPOINT")
+
+
+@functools.cache
+def get_default_credential() -> TokenCredential:
+    """Get the process-wide credential shared by all clients.
+
+    Sharing one instance means tokens are fetched and refreshed once per
+    process rather than once per client.
+
+    Returns:
+        Managed identity (user-assigned when AZURE_CLIENT_ID is set) chained
+        with EnvironmentCredential when running on Azure, otherwise
+        DefaultAzureCredential.
+    """
+    if any(os.environ.get(name) for name in _MANAGED_IDENTITY_ENV_VARS):
+        return ChainedTokenCredential(
+            ManagedIdentityCredential(client_id=os.environ.get("AZURE_CLIENT_ID")),
+            EnvironmentCredential(),
+        )
+    return DefaultAzureCredential()
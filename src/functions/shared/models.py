@@ -101,6 +101,17 @@ class ModuleInput(BaseModel):
         populate_by_name = True
 
 
+class SaveFindingsRequest(BaseModel):
+    """Request body for the save-findings endpoint."""
+
+    execution_id: str = Field(..., min_length=1, alias="executionId")
+    module_id: str = Field(..., min_length=1, alias="moduleId")
+    findings: list[dict[str, Any]] = Field(default_factory=list)
+
+    class Config:
+        populate_by_name = True
+
+
 class ModuleSummary(BaseModel):
     """Summary statistics for module execution."""
 
@@ -7,15 +7,40 @@ should be implemented within each detection module.
 
 from __future__ import annotations
 
+import functools
+import itertools
 import logging
-from typing import Any
-
-from azure.identity import DefaultAzureCredential
+import random
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, NamedTuple, TypeVar
+
+from azure.core.exceptions import HttpResponseError
 from azure.mgmt.resourcegraph import ResourceGraphClient as AzureResourceGraphClient
 from azure.mgmt.resourcegraph.models import QueryRequest, QueryRequestOptions
 
+from shared.credential import get_default_credential
+from shared.transport import get_http_transport
+
 logger = logging.getLogger(__name__)
 
+_RowT = TypeVar("_RowT", bound=NamedTuple)
+
+# One row per subscription with its management group ancestor chain. id must be
+# projected or Resource Graph returns no skip token and truncates at one page.
+# Kept on a single line so every request sends the compact text.
+_SUBSCRIPTIONS_IN_MG_QUERY = (
+    "resourcecontainers"
+    " | where type == 'microsoft.resources/subscriptions'"
+    " | project id, subscriptionId, mgChain = properties.managementGroupAncestorsChain"
+)
+
+# Status codes retried by ResourceGraphClient._execute_with_retry
+_RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
 
 class ResourceGraphClient:
     """Wrapper for Azure Resource Graph queries across subscriptions."""
@@ -23,23 +48,63 @@ class ResourceGraphClient:
     # Maximum subscriptions per query (Azure limit is 1000)
     MAX_SUBSCRIPTIONS_PER_QUERY = 1000
 
-    # Maximum results per page
+    # Results per page; Resource Graph returns at most MAX_PAGE_SIZE rows per page
     DEFAULT_PAGE_SIZE = 1000
+    MAX_PAGE_SIZE = 1000
+
+    # Default number of subscription batches queried concurrently by query_batched
+    DEFAULT_MAX_PARALLEL_BATCHES = 8
+
+    # Management group -> subscriptions lookups are cached for this many seconds
+    MG_CACHE_TTL = 600.0
+
+    # Most query results kept by query(cache_ttl=...), least recently used evicted first
+    QUERY_CACHE_MAX_ENTRIES = 32
+
+    # Attempts per page request when throttled or the service is unavailable
+    MAX_QUERY_ATTEMPTS = 5
 
-    def __init__(self, credential: Any | None = None):
+    # Upper bound, in seconds, on a single retry wait
+    MAX_RETRY_DELAY = 60.0
+
+    def __init__(
+        self,
+        credential: Any | None = None,
+        max_parallel_batches: int | None = None,
+        mg_cache_ttl: float | None = None,
+    ):
         """Initialize Resource Graph client.
 
         Args:
-            credential: Azure credential. Defaults to DefaultAzureCredential.
+            credential: Azure credential. Defaults to the shared credential from
+                get_default_credential().
+            max_parallel_batches: Maximum subscription batches queried in
+                parallel by query_batched. Defaults to 8; keep it modest, as
+                Resource Graph throttles per tenant.
+            mg_cache_ttl: Seconds to cache the subscriptions found under each
+                management group. Defaults to MG_CACHE_TTL; 0 disables caching.
         """
-        self.credential = credential or DefaultAzureCredential()
-        self._client = AzureResourceGraphClient(self.credential)
+        self.credential = credential or get_default_credential()
+        self.max_parallel_batches = max_parallel_batches or self.DEFAULT_MAX_PARALLEL_BATCHES
+        self._client = _shared_sdk_client(self.credential)
+        self._throttled_until = 0.0
+        self._throttle_lock = threading.Lock()
+
+        self.mg_cache_ttl = self.MG_CACHE_TTL if mg_cache_ttl is None else mg_cache_ttl
+        self._mg_cache: dict[str, tuple[float, list[str]]] = {}
+        self._mg_cache_lock = threading.Lock()
+
+        self._query_cache: OrderedDict[tuple, tuple[float, list[dict[str, Any]]]] = OrderedDict()
+        self._query_cache_lock = threading.Lock()
 
     def query(
         self,
         query: str,
         subscription_ids: list[str] | None = None,
         management_group_id: str | None = None,
+        page_size: int | None = None,
+        management_group_ids: list[str] | None = None,
+        cache_ttl: float | None = None,
     ) -> list[dict[str, Any]]:
         """Execute a Resource Graph query.
 
@@ -48,64 +113,285 @@ class ResourceGraphClient:
             subscription_ids: List of subscription IDs to query. If None and
                 management_group_id is None, queries all accessible subscriptions.
             management_group_id: Management group ID for cross-subscription queries.
+            page_size: Rows requested per page, at least 1. Defaults to
+                DEFAULT_PAGE_SIZE and is capped at MAX_PAGE_SIZE. Lower it for wide projections to
+                bound per-page memory.
+            management_group_ids: Several management group IDs to query at once,
+                instead of management_group_id.
+            cache_ttl: If set, reuse the results of an identical query (same
+                text and scope) made within this many seconds. The returned
+                list is a copy, but the row dictionaries are shared with the
+                cache and must not be modified.
 
         Returns:
             List of query results as dictionaries.
-        """
-        all_results = []
-        skip_token = None
 
-        while True:
-            options = QueryRequestOptions(
-                result_format="objectArray",
-                skip_token=skip_token,
+        Raises:
+            ValueError: If page_size is less than 1.
+        """
+        _check_page_size(page_size)
+        if not cache_ttl:
+            return list(
+                self.query_iter(
+                    query, subscription_ids, management_group_id, page_size, management_group_ids
+                )
             )
 
-            request = QueryRequest(
-                query=query,
-                subscriptions=subscription_ids,
-                management_groups=[management_group_id] if management_group_id else None,
-                options=options,
+        key = (
+            query,
+            frozenset(subscription_ids or ()),
+            management_group_id,
+            frozenset(management_group_ids or ()),
+        )
+        now = time.monotonic()
+        with self._query_cache_lock:
+            cached = self._query_cache.get(key)
+            if cached is not None and cached[0] > now:
+                self._query_cache.move_to_end(key)
+                return list(cached[1])
+
+        results = list(
+            self.query_iter(
+                query, subscription_ids, management_group_id, page_size, management_group_ids
             )
+        )
+
+        with self._query_cache_lock:
+            self._query_cache[key] = (now + cache_ttl, results)
+            self._query_cache.move_to_end(key)
+            while len(self._query_cache) > self.QUERY_CACHE_MAX_ENTRIES:
+                self._query_cache.popitem(last=False)
+        return list(results)
 
-            response = self._client.resources(request)
-            all_results.extend(response.data)
+    def query_iter(
+        self,
+        query: str,
+        subscription_ids: list[str] | None = None,
+        management_group_id: str | None = None,
+        page_size: int | None = None,
+        management_group_ids: list[str] | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Execute a Resource Graph query, yielding rows as pages arrive.
+
+        Only one page is held in memory at a time, so callers that process
+        rows one by one never materialize the full result set. The next page
+        is requested lazily, once the current one has been consumed.
+
+        Args:
+            query: KQL query string.
+            subscription_ids: List of subscription IDs to query. If None and
+                management_group_id is None, queries all accessible subscriptions.
+            management_group_id: Management group ID for cross-subscription queries.
+            page_size: Rows requested per page, at least 1. Defaults to
+                DEFAULT_PAGE_SIZE and is capped at MAX_PAGE_SIZE. Lower it for wide projections to
+                bound per-page memory.
+            management_group_ids: Several management group IDs to query at once,
+                instead of management_group_id.
+
+        Yields:
+            Query results as dictionaries.
+
+        Raises:
+            ValueError: If page_size is less than 1.
+        """
+        _check_page_size(page_size)
+        page = 0
+        options = QueryRequestOptions(
+            result_format="objectArray",
+            top=min(page_size or self.DEFAULT_PAGE_SIZE, self.MAX_PAGE_SIZE),
+        )
+
+        # Only the skip token changes between pages, so the request is built
+        # once and serialized again for each page
+        request = QueryRequest(
+            query=query,
+            subscriptions=subscription_ids,
+            management_groups=management_group_ids
+            or ([management_group_id] if management_group_id else None),
+            options=options,
+        )
+
+        while True:
+            response = self._execute_with_retry(request)
+            yield from response.data
 
             # Check for more pages
-            skip_token = response.skip_token
-            if not skip_token:
+            if not response.skip_token:
                 break
+            options.skip_token = response.skip_token
 
-            logger.debug(f"Fetching next page, current count: {len(all_results)}")
+            page += 1
+            logger.debug("Fetching page %d", page + 1)
 
-        return all_results
+    def query_typed(
+        self,
+        query: str,
+        row_type: type[_RowT],
+        subscription_ids: list[str] | None = None,
+        management_group_id: str | None = None,
+        page_size: int | None = None,
+    ) -> list[_RowT]:
+        """Execute a query with a fixed projection and return rows as named tuples.
+
+        Tuples carry no per-row key strings or hash table, so large result
+        sets take far less memory than the dicts returned by query().
+        Columns missing from a row are filled with None.
+
+        Args:
+            query: KQL query string whose projection matches row_type's fields.
+            row_type: NamedTuple class describing one result row.
+            subscription_ids: List of subscription IDs to query.
+            management_group_id: Management group ID for cross-subscription queries.
+            page_size: Rows requested per page (see query_iter).
+
+        Returns:
+            List of row_type instances.
+        """
+        fields = row_type._fields
+        make = row_type._make
+        return [
+            make([row.get(field) for field in fields])
+            for row in self.query_iter(query, subscription_ids, management_group_id, page_size)
+        ]
+
+    def _execute_with_retry(self, request: QueryRequest):
+        """Send one Resource Graph request, retrying throttled and transient failures.
+
+        Waits for Retry-After or x-ms-user-quota-resets-after when the service
+        provides them (exponential backoff otherwise), plus up to 10% jitter so
+        parallel batches do not retry in lockstep. Once a response reports the
+        tenant's quota as exhausted, every thread holds off until it resets
+        instead of spending a request on a certain 429.
+        """
+        attempt = 1
+        while True:
+            with self._throttle_lock:
+                wait = self._throttled_until - time.monotonic()
+            if wait > 0:
+                logger.info("Resource Graph quota exhausted; waiting %.1fs", wait)
+                time.sleep(wait)
+
+            try:
+                return self._client.resources(request, raw_response_hook=self._track_quota)
+            except HttpResponseError as e:
+                if e.status_code not in _RETRYABLE_STATUS_CODES:
+                    raise
+                if attempt >= self.MAX_QUERY_ATTEMPTS:
+                    raise
+
+                headers = e.response.headers if e.response is not None else {}
+                delay = min(_retry_delay(headers, attempt), self.MAX_RETRY_DELAY)
+                delay += random.uniform(0, delay * 0.1)
+                logger.warning(
+                    "Resource Graph returned %s; retrying in %.1fs (attempt %d/%d)",
+                    e.status_code,
+                    delay,
+                    attempt,
+                    self.MAX_QUERY_ATTEMPTS,
+                )
+                time.sleep(delay)
+                attempt += 1
+
+    def _track_quota(self, pipeline_response) -> None:
+        """Record when the tenant's Resource Graph quota resets once it is used up."""
+        headers = pipeline_response.http_response.headers
+        if headers.get("x-ms-user-quota-remaining") != "0":
+            return
+        reset = _parse_quota_reset(headers.get("x-ms-user-quota-resets-after"))
+        if reset:
+            with self._throttle_lock:
+                self._throttled_until = max(self._throttled_until, time.monotonic() + reset)
 
     def query_batched(
         self,
         query: str,
         subscription_ids: list[str],
+        ordered: bool = True,
+        page_size: int | None = None,
+        cache_ttl: float | None = None,
     ) -> list[dict[str, Any]]:
         """Execute a query across many subscriptions in batches.
 
         Use this when querying more subscriptions than the per-query limit.
+        Batches are independent, so up to max_parallel_batches of them are
+        queried concurrently.
 
         Args:
             query: KQL query string.
             subscription_ids: List of subscription IDs to query.
+            ordered: If True, results are combined in batch order. If False,
+                each batch's results are appended as soon as it completes.
+            page_size: Rows requested per page (see query_iter).
+            cache_ttl: Per-batch result caching (see query).
 
         Returns:
             Combined results from all batches.
+
+        Raises:
+            ValueError: If subscription_ids is empty or page_size is less than 1.
         """
-        all_results = []
+        if not subscription_ids:
+            raise ValueError("subscription_ids must not be empty")
+        _check_page_size(page_size)
+
+        # Within the per-query limit there is nothing to split or fan out
+        if len(subscription_ids) <= self.MAX_SUBSCRIPTIONS_PER_QUERY:
+            return self.query(
+                query, subscription_ids=subscription_ids, page_size=page_size, cache_ttl=cache_ttl
+            )
 
-        # Split into batches
-        for i in range(0, len(subscription_ids), self.MAX_SUBSCRIPTIONS_PER_QUERY):
-            batch = subscription_ids[i : i + self.MAX_SUBSCRIPTIONS_PER_QUERY]
-            logger.debug(f"Querying batch {i // self.MAX_SUBSCRIPTIONS_PER_QUERY + 1}")
-            results = self.query(query, subscription_ids=batch)
-            all_results.extend(results)
+        batches = [
+            subscription_ids[i : i + self.MAX_SUBSCRIPTIONS_PER_QUERY]
+            for i in range(0, len(subscription_ids), self.MAX_SUBSCRIPTIONS_PER_QUERY)
+        ]
+        logger.debug("Querying %d subscription batches", len(batches))
+
+        max_workers = min(self.max_parallel_batches, len(batches))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self.query,
+                    query,
+                    subscription_ids=batch,
+                    page_size=page_size,
+                    cache_ttl=cache_ttl,
+                )
+                for batch in batches
+            ]
+            completed = futures if ordered else as_completed(futures)
+            return list(itertools.chain.from_iterable(future.result() for future in completed))
+
+    def query_batched_iter(
+        self,
+        query: str,
+        subscription_ids: list[str],
+        page_size: int | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Streaming variant of query_batched; yields rows batch by batch.
 
-        return all_results
+        Args:
+            query: KQL query string.
+            subscription_ids: List of subscription IDs to query.
+            page_size: Rows requested per page (see query_iter).
+
+        Yields:
+            Query results as dictionaries.
+
+        Raises:
+            ValueError: If subscription_ids is empty or page_size is less than 1.
+        """
+        if not subscription_ids:
+            raise ValueError("subscription_ids must not be empty")
+        _check_page_size(page_size)
+
+        batches = (
+            subscription_ids[i : i + self.MAX_SUBSCRIPTIONS_PER_QUERY]
+            for i in range(0, len(subscription_ids), self.MAX_SUBSCRIPTIONS_PER_QUERY)
+        )
+        return itertools.chain.from_iterable(
+            self.query_iter(query, subscription_ids=batch, page_size=page_size)
+            for batch in batches
+        )
 
     def query_single(
         self,
@@ -130,7 +416,8 @@ class ResourceGraphClient:
         """Get all subscription IDs under a management group.
 
         Uses Azure Resource Graph to query the management group hierarchy
-        and return all child subscription IDs.
+        and return all child subscription IDs. The hierarchy rarely changes,
+        so results are cached per management group for mg_cache_ttl seconds.
 
         Args:
             management_group_id: Management group ID (name, not full resource ID).
@@ -138,14 +425,72 @@ class ResourceGraphClient:
         Returns:
             List of subscription IDs under the management group.
         """
-        query = """
-            resourcecontainers
-            | where type == 'microsoft.resources/subscriptions'
-            | project subscriptionId
+        return self.get_subscriptions_in_management_groups([management_group_id])[
+            management_group_id
+        ]
+
+    def get_subscriptions_in_management_groups(
+        self,
+        management_group_ids: list[str],
+    ) -> dict[str, list[str]]:
+        """Get the subscription IDs under each of several management groups.
+
+        All uncached management groups are resolved with a single Resource
+        Graph query scoped to every one of them. Each subscription is
+        attributed to the requested groups found in its management group
+        ancestor chain, so a subscription under nested requested groups is
+        listed under each of them. Results are cached per management group
+        for mg_cache_ttl seconds.
+
+        Args:
+            management_group_ids: Management group IDs (names, not full resource IDs).
+
+        Returns:
+            Mapping of each management group ID to its subscription IDs.
         """
+        unique_ids = list(dict.fromkeys(management_group_ids))
+        resolved: dict[str, list[str]] = {}
+        missing: list[str] = []
+
+        now = time.monotonic()
+        with self._mg_cache_lock:
+            for mg_id in unique_ids:
+                cached = self._mg_cache.get(mg_id)
+                if cached is not None and cached[0] > now:
+                    resolved[mg_id] = list(cached[1])
+                else:
+                    missing.append(mg_id)
+
+        if missing:
+            # Management group names are case-insensitive
+            requested = {mg_id.lower(): mg_id for mg_id in missing}
+            found: dict[str, list[str]] = {mg_id: [] for mg_id in missing}
+            for row in self.query_iter(_SUBSCRIPTIONS_IN_MG_QUERY, management_group_ids=missing):
+                for ancestor in row.get("mgChain") or []:
+                    mg_id = requested.get((ancestor.get("name") or "").lower())
+                    if mg_id is not None:
+                        found[mg_id].append(row["subscriptionId"])
+
+            if self.mg_cache_ttl > 0:
+                with self._mg_cache_lock:
+                    for mg_id, subscription_ids in found.items():
+                        self._mg_cache[mg_id] = (now + self.mg_cache_ttl, subscription_ids)
+            resolved.update((mg_id, list(subs)) for mg_id, subs in found.items())
+
+        return {mg_id: resolved[mg_id] for mg_id in unique_ids}
+
+    def invalidate_mg_cache(self, management_group_id: str | None = None) -> None:
+        """Drop cached management group lookups.
 
-        results = self.query(query, management_group_id=management_group_id)
-        return [r["subscriptionId"] for r in results]
+        Args:
+            management_group_id: Management group to forget. If None, clears
+                the whole cache.
+        """
+        with self._mg_cache_lock:
+            if management_group_id is None:
+                self._mg_cache.clear()
+            else:
+                self._mg_cache.pop(management_group_id, None)
 
     def resolve_targets_to_subscriptions(
         self,
@@ -155,21 +500,81 @@ class ResourceGraphClient:
         """Resolve mixed targets (subscriptions + management groups) to subscription IDs.
 
         Combines directly specified subscription IDs with subscriptions discovered
-        under each management group. Duplicates are removed.
+        under each management group. Duplicates are removed, keeping the order
+        in which each subscription was first seen.
 
         Args:
             subscription_ids: Direct subscription IDs to include.
             management_group_ids: Management group IDs to resolve to subscriptions.
 
         Returns:
-            Deduplicated list of all subscription IDs.
+            Deduplicated list of all subscription IDs: direct subscriptions first,
+            then each management group's in the order given.
         """
-        all_subscription_ids = set(subscription_ids or [])
+        # A dict keeps first-seen order, so the result is stable across runs
+        all_subscription_ids = dict.fromkeys(subscription_ids or [])
 
-        for mg_id in management_group_ids or []:
-            logger.info(f"Resolving management group: {mg_id}")
-            mg_subscriptions = self.get_subscriptions_in_management_group(mg_id)
-            logger.info(f"Found {len(mg_subscriptions)} subscriptions in {mg_id}")
-            all_subscription_ids.update(mg_subscriptions)
+        if management_group_ids:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Resolving management groups: %s", ", ".join(management_group_ids))
+            by_mg = self.get_subscriptions_in_management_groups(management_group_ids)
+            for mg_id, mg_subscriptions in by_mg.items():
+                logger.info("Found %d subscriptions in %s", len(mg_subscriptions), mg_id)
+                all_subscription_ids.update(dict.fromkeys(mg_subscriptions))
 
         return list(all_subscription_ids)
+
+
+@functools.lru_cache(maxsize=8)
+def _shared_sdk_client(credential: Any) -> AzureResourceGraphClient:
+    """Get the SDK client for a credential, shared by every wrapper using it.
+
+    Wrappers created with the same credential (including the default shared
+    credential) reuse one SDK client, and with it one pipeline and token
+    cache, instead of building their own.
+    """
+    # Status-code retries are done by _execute_with_retry, which understands
+    # Resource Graph's quota headers; the SDK still retries connection errors
+    return AzureResourceGraphClient(credential, transport=get_http_transport(), retry_status=0)
+
+
+def _check_page_size(page_size: int | None) -> None:
+    """Reject page sizes Resource Graph cannot serve ($top must be at least 1)."""
+    if page_size is not None and page_size < 1:
+        raise ValueError(f"page_size must be at least 1, got {page_size}")
+
+
+def _parse_quota_reset(value: str | None) -> float | None:
+    """Parse an x-ms-user-quota-resets-after value (hh:mm:ss) into seconds."""
+    if not value:
+        return None
+    try:
+        hours, minutes, seconds = value.split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except ValueError:
+        return None
+
+
+def _retry_delay(headers, attempt: int) -> float:
+    """Seconds to wait before retry number attempt, preferring the service's hints."""
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    reset = _parse_quota_reset(headers.get("x-ms-user-quota-resets-after"))
+    if reset is not None:
+        return reset
+    return float(2**attempt)
+
+
+@functools.cache
+def get_resource_graph_client() -> ResourceGraphClient:
+    """Get the process-wide ResourceGraphClient using the default credential.
+
+    Function invocations on a warm host share this instance, so the SDK's
+    connection pool and cached tokens are reused instead of being rebuilt
+    per request.
+    """
+    return ResourceGraphClient()
@@ -0,0 +1,35 @@
+"""Shared HTTP transport for the Azure SDK clients.
+
+The Cosmos DB and Resource Graph clients are handed the same pooled
+requests session, so connections (and their TLS sessions) to Azure
+endpoints are kept alive and reused across invocations on a warm host.
+"""
+
+from __future__ import annotations
+
+import functools
+
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from requests.adapters import HTTPAdapter
+
+# Connections kept open per host; sized above the largest fan-out
+# (save_findings batches and query_batched batches run up to 8 at a time)
+POOL_MAXSIZE = 32
+
+
+@functools.cache
+def get_http_transport() -> RequestsTransport:
+    """Get the process-wide pooled transport for Azure SDK clients.
+
+    Retries are left to the clients (the SDK pipelines' retry policies and
+    ResourceGraphClient's quota-aware retry); the adapter does not retry.
+
+    Returns:
+        RequestsTransport over a shared session. The session is not owned
+        by the transport, so closing one client does not close it for others.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    return RequestsTransport(session=session, session_owner=False)